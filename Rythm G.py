@@ -1,21 +1,33 @@
 import os
-import time
 import random
 import sys
-import gc
 import argparse
 import json
 import logging
+import math
+import functools
+import hashlib
+import struct
+import wave
+import zipfile
 from datetime import datetime
 from pathlib import Path
 import subprocess
+import tempfile
+import threading
 from difflib import get_close_matches
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     import numpy as np
     NUMPY_AVAILABLE = True
 except ImportError:
     NUMPY_AVAILABLE = False
+    try:
+        import audioop  # C-implemented mixing fallback; no longer in the standard library from Python 3.13
+    except ImportError:
+        logging.error("NumPy is required on Python 3.13+, where audioop was removed. Install with: pip install numpy (or pip install audioop-lts)")
+        sys.exit(1)
     logging.warning("NumPy not installed. Synthetic tones disabled. Install with: pip install numpy")
 
 try:
@@ -26,6 +38,34 @@ except ImportError:
     logging.error("pydub not installed. Install with: pip install pydub")
     sys.exit(1)
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    # Without Numba the kernels run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    from scipy.io import wavfile
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Parse JSON text or bytes, with orjson when it is installed
+json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
 try:
     import simpleaudio as sa
     SIMPLEAUDIO_AVAILABLE = True
@@ -41,29 +81,72 @@ except ImportError:
     RICH_AVAILABLE = False
     logging.warning("rich not installed. Using basic console output. Install with: pip install rich")
 
-try:
-    import mido
-    MIDO_AVAILABLE = True
-except ImportError:
-    MIDO_AVAILABLE = False
-    logging.warning("mido not installed. MIDI export disabled. Install with: pip install mido")
-
-# Setup logging
+# Setup logging: the full record goes to the log file, the console gets the bare message once
 def setup_logging(debug=False):
     level = logging.DEBUG if debug else logging.INFO
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler("rhythm_generator.log"),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    file_handler = logging.FileHandler("rhythm_generator.log")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    CONSOLE_HANDLER.setFormatter(logging.Formatter("%(message)s"))
+    # force replaces the default handler that import-time warnings already installed
+    logging.basicConfig(level=level, handlers=[file_handler, CONSOLE_HANDLER], force=True)
 
 console = Console() if RICH_AVAILABLE else None
 
+# Print a line to the console, bound once to rich's styled print or the builtin
+if RICH_AVAILABLE:
+    def echo(text, style=None):
+        console.print(text, style=style, markup=False)
+else:
+    def echo(text, style=None):
+        print(text)
+
+# Print log records through echo, with say()'s icon and style or a colour for warnings and errors;
+# Handler.handle holds a lock around emit, so export worker threads never interleave their lines
+class ConsoleHandler(logging.Handler):
+    LEVEL_STYLES = {logging.WARNING: "yellow", logging.ERROR: "red", logging.CRITICAL: "bold red"}
+    held = None  # Worker-thread records kept back while the main thread waits on input()
+
+    def emit(self, record):
+        if self.held is not None and threading.current_thread() is not threading.main_thread():
+            self.held.append(record)
+            return
+        try:
+            text = self.format(record)
+            icon = getattr(record, "icon", None)
+            echo(f"{icon} {text}" if icon else text, getattr(record, "style", None) or self.LEVEL_STYLES.get(record.levelno))
+        except Exception:
+            self.handleError(record)
+
+    # Keep console output from worker threads back until release_worker_output()
+    def hold_worker_output(self):
+        self.held = []
+
+    # Print the held records in order and go back to printing as they arrive
+    def release_worker_output(self):
+        with self.lock:
+            held, self.held = self.held or [], None
+            for record in held:
+                self.emit(record)
+
+CONSOLE_HANDLER = ConsoleHandler()
+
+# Log a status message; the console handler shows it styled, so it is formatted and printed only once
+def say(msg, style=None, level=logging.INFO, icon=None):
+    logging.log(level, msg, extra={"style": style, "icon": icon})
+
+# Shared PCG64 generator for batched random draws
+RNG = np.random.default_rng() if NUMPY_AVAILABLE else None
+
 # Constants
 SAMPLE_RATE = 44100
+SAMPLE_CACHE_DIR = os.path.join("samples", ".cache")
+RENDER_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "talonix")
+RENDER_CACHE_SIZE = 32
+# Part of every render cache key; bump it whenever the mixer's output or the cache layout changes
+RENDER_CACHE_VERSION = 2
+# Config keys passed straight through to generate_rhythm, which also identify a render
+RENDER_KEYS = ("style", "instruments", "bpm", "note_type", "swing", "complexity", "volumes", "pattern_length",
+               "time_signature", "subdivision", "fill_frequency", "master_volume", "pan_settings", "loop_repeats")
 MIN_BPM = 20
 MAX_BPM = 300
 MIN_SWING = -50
@@ -73,6 +156,7 @@ NOTE_TYPES = {"whole": 4, "half": 2, "quarter": 1, "eighth": 0.5, "sixteenth": 0
 COMPLEXITY_LEVELS = ["simple", "medium", "complex"]
 TIME_SIGNATURES = ["4/4", "3/4", "6/8"]
 SUBDIVISIONS = ["straight", "triplet"]
+FORBIDDEN_NAME_CHARS = frozenset('<>:"/\\|?*')
 
 # Mapping of instrument names to sample folder names (handling plural forms)
 INSTRUMENT_TO_FOLDER = {
@@ -89,6 +173,8 @@ INSTRUMENT_TO_FOLDER = {
 
 # Available instruments
 AVAILABLE_INSTRUMENTS = list(INSTRUMENT_TO_FOLDER.keys())
+INSTRUMENT_INDEX = {name: i for i, name in enumerate(AVAILABLE_INSTRUMENTS)}
+AVAILABLE_INSTRUMENT_SET = frozenset(AVAILABLE_INSTRUMENTS)
 
 # Default style configurations
 STYLE_CONFIGS = {
@@ -154,6 +240,20 @@ STYLE_CONFIGS = {
     }
 }
 
+# Validate a per-instrument volume answer (memoized; the same defaults come back for every instrument)
+@functools.lru_cache(maxsize=512)
+def valid_volume(value):
+    return 0 <= int(value) <= 100
+
+# Validate a per-instrument pan answer (memoized)
+@functools.lru_cache(maxsize=512)
+def valid_pan(value):
+    return -1.0 <= float(value) <= 1.0
+
+# Validate a project name: non-empty and free of characters that are invalid in file names
+def valid_project_name(value):
+    return bool(value.strip()) and FORBIDDEN_NAME_CHARS.isdisjoint(value)
+
 # Check for FFmpeg availability
 def check_ffmpeg():
     try:
@@ -163,55 +263,172 @@ def check_ffmpeg():
         logging.error("FFmpeg not found. MP3 export requires FFmpeg. Install it from https://ffmpeg.org/download.html or use WAV format.")
         return False
 
-# Generate a synthetic tone as a fallback
-def generate_synthetic_tone(frequency=440, duration_ms=200):
+# Generate a synthetic tone as cached, read-only int16 samples (silent bytes without NumPy)
+@functools.lru_cache(maxsize=64)
+def tone_array(frequency=440, duration_ms=200):
+    n = int(SAMPLE_RATE * duration_ms / 1000)
     if not NUMPY_AVAILABLE:
         logging.warning("Cannot generate synthetic tone: NumPy not installed.")
-        return AudioSegment.silent(duration=duration_ms)
-    sample_rate = SAMPLE_RATE
-    t = np.linspace(0, duration_ms / 1000, int(sample_rate * duration_ms / 1000), False)
-    tone = np.sin(frequency * t * 2 * np.pi) * 0.5
-    audio = np.int16(tone * 32767).tobytes()
-    return AudioSegment(audio, frame_rate=sample_rate, sample_width=2, channels=1)
-
-# Create a silent segment
+        return b'\x00' * (n * 2)
+    phase = np.arange(n, dtype=np.float32) * np.float32(2 * np.pi * frequency / SAMPLE_RATE)
+    np.sin(phase, out=phase)
+    phase *= 0.5 * 32767
+    tone = phase.astype(np.int16)
+    tone.setflags(write=False)
+    return tone
+
+# Generate a synthetic tone as a fallback AudioSegment
+def generate_synthetic_tone(frequency=440, duration_ms=200):
+    return AudioSegment(bytes(tone_array(frequency, duration_ms)), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
+
+# Convert to mono 16-bit at SAMPLE_RATE, skipping the copies when already there
+def ensure_params(seg):
+    if seg.channels == 1 and seg.frame_rate == SAMPLE_RATE and seg.sample_width == 2:
+        return seg
+    return seg.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+
+# View an AudioSegment's raw data as int16 samples (zero-copy); raw bytes without NumPy
+def seg_to_np(seg):
+    if not NUMPY_AVAILABLE:
+        return seg.raw_data
+    return np.frombuffer(seg.raw_data, dtype=np.int16)
+
+# Wrap (interleaved) int16 samples in an AudioSegment, optionally repeated end to end
+def np_to_seg(arr, channels=1, repeats=1):
+    # Repeating the bytes fills the final buffer in one allocation, with no tiled array in between
+    return AudioSegment(arr.tobytes() * repeats, frame_rate=SAMPLE_RATE, sample_width=2, channels=channels)
+
+# Write interleaved int16 samples straight to a WAV file
+def write_wav(filename, samples, channels=1):
+    if SCIPY_AVAILABLE:
+        wavfile.write(filename, SAMPLE_RATE, samples.reshape(-1, channels) if channels > 1 else samples)
+        return
+    # The header's small writes coalesce in the buffer, and with nframes known up front
+    # wave writes the final header once instead of seeking back to patch it
+    with open(filename, 'wb', buffering=1 << 20) as f, wave.open(f, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.setnframes(memoryview(samples).nbytes // (2 * channels))
+        wav_file.writeframes(samples)
+
+# Write a segment to disk: WAV directly, anything else through one ffmpeg pipe instead of pydub's temp file
+def write_audio(filename, output_format, seg):
+    if output_format == "wav":
+        write_wav(filename, seg_to_np(seg), seg.channels)
+        return
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "s16le", "-ar", str(seg.frame_rate),
+           "-ac", str(seg.channels), "-i", "-", "-f", output_format, filename]
+    result = subprocess.run(cmd, input=seg.raw_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+
+# Scale samples (per row) to just below full scale in place, like pydub's normalize
+def normalize_np(samples, headroom=0.1):
+    peaks = np.abs(samples).max(axis=-1, keepdims=True)
+    scale = np.where(peaks > 0, 32768 * 10 ** (-headroom / 20) / np.maximum(peaks, 1), 1.0)
+    np.multiply(samples, scale, out=samples, casting='unsafe')
+
+# Create a silent mono 16-bit segment directly from zero bytes
 def create_silent_segment(duration_ms):
-    return AudioSegment.silent(duration=duration_ms, frame_rate=SAMPLE_RATE)
+    n_frames = int(SAMPLE_RATE * duration_ms / 1000)
+    return AudioSegment(b'\x00' * (n_frames * 2), frame_rate=SAMPLE_RATE, sample_width=2, channels=1)
+
+# Read a WAV file as int16 samples; files that need converting are decoded by pydub once and cached on disk
+def read_wav_samples(path):
+    try:
+        with wave.open(path, 'rb') as wav_file:
+            if wav_file.getnchannels() == 1 and wav_file.getframerate() == SAMPLE_RATE and wav_file.getsampwidth() == 2:
+                data = wav_file.readframes(wav_file.getnframes())
+                return np.frombuffer(data, dtype=np.int16) if NUMPY_AVAILABLE else data
+    except (wave.Error, EOFError):
+        pass  # Not plain PCM; let pydub decode it
+    if not NUMPY_AVAILABLE:
+        return seg_to_np(ensure_params(AudioSegment.from_wav(path)))
 
-# Load samples for a given instrument
+    # Reuse a previous decode unless the file changed since
+    key = hashlib.blake2b(f"{path}:{os.path.getmtime(path)}".encode()).hexdigest()
+    cache_path = os.path.join(SAMPLE_CACHE_DIR, f"{key}.npy")
+    if os.path.exists(cache_path):
+        try:
+            samples = np.load(cache_path)
+            samples.setflags(write=False)
+            return samples
+        except (OSError, ValueError, EOFError) as e:
+            # A truncated entry would fail on every run; drop it and decode the file again
+            logging.warning(f"Ignoring unreadable sample cache {cache_path}: {e}")
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+
+    samples = seg_to_np(ensure_params(AudioSegment.from_wav(path)))
+    try:
+        os.makedirs(SAMPLE_CACHE_DIR, exist_ok=True)
+        # Write to a temp file and move it into place, so an interrupted run never leaves a truncated entry
+        fd, temp_path = tempfile.mkstemp(dir=SAMPLE_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, samples)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except OSError as e:
+        logging.warning(f"Could not write sample cache {cache_path}: {e}")
+    return samples
+
+# Map lower-cased instrument folder names to their paths, scanning the samples directory once
+@functools.lru_cache(maxsize=None)
+def folder_index(samples_dir):
+    # DirEntry carries the file type, so no stat() per entry
+    with os.scandir(samples_dir) as it:
+        return {e.name.lower(): e.path for e in it if e.is_dir() and not e.name.startswith('.')}
+
+# Instruments with a sample folder of their own, i.e. the ones worth decoding ahead of time
+def instruments_with_samples(samples_dir="samples"):
+    if not os.path.isdir(samples_dir):
+        return []
+    folder_paths = folder_index(samples_dir)
+    return [inst for inst in AVAILABLE_INSTRUMENTS if INSTRUMENT_TO_FOLDER.get(inst, inst).lower() in folder_paths]
+
+# Load samples for a given instrument as cached, read-only int16 arrays
+@functools.lru_cache(maxsize=None)
 def load_samples(instrument):
     samples_dir = "samples"
     folder_name = INSTRUMENT_TO_FOLDER.get(instrument, instrument).lower()
     
     if not os.path.exists(samples_dir):
         logging.error(f"Samples directory '{samples_dir}' does not exist. Using synthetic tone for '{instrument}'.")
-        return [generate_synthetic_tone(frequency=200 + 100 * AVAILABLE_INSTRUMENTS.index(instrument))]
+        return (tone_array(frequency=200 + 100 * INSTRUMENT_INDEX[instrument]),)
 
-    available_folders = [f.lower() for f in os.listdir(samples_dir) if os.path.isdir(os.path.join(samples_dir, f))]
-    if folder_name not in available_folders:
-        matches = get_close_matches(folder_name, available_folders, n=1, cutoff=0.8)
+    folder_paths = folder_index(samples_dir)
+    if folder_name not in folder_paths:
+        # Fuzzy matching only runs when the exact name misses
+        matches = get_close_matches(folder_name, list(folder_paths), n=1, cutoff=0.8)
         if matches:
             corrected_folder = matches[0]
             logging.warning(f"Instrument folder '{folder_name}' not found. Using closest match '{corrected_folder}'.")
             folder_name = corrected_folder
         else:
             logging.warning(f"No samples directory for '{instrument}' (expected '{folder_name}'). Using synthetic tone.")
-            return [generate_synthetic_tone(frequency=200 + 100 * AVAILABLE_INSTRUMENTS.index(instrument))]
+            return (tone_array(frequency=200 + 100 * INSTRUMENT_INDEX[instrument]),)
 
-    folder_path = os.path.join(samples_dir, folder_name)
-    if not os.listdir(folder_path):
+    folder_path = folder_paths[folder_name]
+    with os.scandir(folder_path) as it:
+        entries = list(it)
+    if not entries:
         logging.warning(f"Samples directory '{folder_path}' is empty. Using synthetic tone for '{instrument}'.")
-        return [generate_synthetic_tone(frequency=200 + 100 * AVAILABLE_INSTRUMENTS.index(instrument))]
+        return (tone_array(frequency=200 + 100 * INSTRUMENT_INDEX[instrument]),)
 
     samples = []
-    for file in os.listdir(folder_path):
-        if file.lower().endswith('.wav'):
-            sample_path = os.path.join(folder_path, file)
+    for entry in entries:
+        if entry.is_file() and entry.name.lower().endswith('.wav'):
+            sample_path = entry.path
             try:
-                sample = AudioSegment.from_wav(sample_path)
-                sample = sample.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+                sample = read_wav_samples(sample_path)
                 samples.append(sample)
-                logging.debug(f"Loaded sample: {file} ({len(sample)}ms) for '{instrument}'")
+                logging.debug(f"Loaded sample: {entry.name} ({len(sample) * 1000 // SAMPLE_RATE}ms) for '{instrument}'")
             except CouldntDecodeError as e:
                 logging.error(f"Failed to decode {sample_path}: {e}. Skipping file.")
             except Exception as e:
@@ -219,27 +436,27 @@ def load_samples(instrument):
     
     if not samples:
         logging.warning(f"No valid samples for '{instrument}' in '{folder_path}'. Using synthetic tone.")
-        return [generate_synthetic_tone(frequency=200 + 100 * AVAILABLE_INSTRUMENTS.index(instrument))]
-    return samples
+        return (tone_array(frequency=200 + 100 * INSTRUMENT_INDEX[instrument]),)
+    return tuple(samples)
+
+# Trim or zero-pad a sample to exactly n_frames
+def fit_to_frames(samples, n_frames):
+    if not NUMPY_AVAILABLE:
+        return samples[:n_frames * 2].ljust(n_frames * 2, b'\x00')
+    if len(samples) >= n_frames:
+        return samples[:n_frames]
+    return np.concatenate([samples, np.zeros(n_frames - len(samples), dtype=np.int16)])
 
 # Randomly choose a sample
 def choose_sample(samples):
-    return random.choice(samples) if samples else create_silent_segment(200)
-
-# Apply swing to beat timing
-def apply_swing(beat_idx, swing_percent, beat_duration_ms):
-    if swing_percent == 0 or beat_idx % 2 == 0:
-        return 0
-    swing_ms = (swing_percent / 100) * (beat_duration_ms / 2)
-    return swing_ms
-
-# Apply panning
-def apply_panning(audio, pan):
-    if pan == 0:
-        return audio
-    left_gain = -pan * 12
-    right_gain = pan * 12
-    return audio.set_channels(2).pan(left_gain=left_gain, right_gain=right_gain)
+    return random.choice(samples) if samples else seg_to_np(create_silent_segment(200))
+
+# Per-beat start offsets in frames: every odd beat is delayed (or pushed ahead) by the swing amount
+def swing_offsets(swing_percent, beat_duration_ms, pattern_length):
+    swing_frames = int((swing_percent / 100) * (beat_duration_ms / 2) * SAMPLE_RATE / 1000)
+    if NUMPY_AVAILABLE:
+        return np.where(np.arange(pattern_length) & 1, swing_frames, 0)
+    return [swing_frames if beat_idx & 1 else 0 for beat_idx in range(pattern_length)]
 
 # Apply volume adjustment (in dB)
 def apply_volume(audio, volume):
@@ -249,56 +466,95 @@ def apply_volume(audio, volume):
     db_change = (volume - 100) * 0.24
     return audio + db_change
 
+# Linear gain matching the apply_volume dB curve
+def volume_to_gain(volume):
+    return 10 ** ((volume - 100) * 0.24 / 20)
+
+# Left/right linear gains for a volume and pan, using a constant-power (sin/cos) pan law
+def pan_gains(volume, pan):
+    gain = volume_to_gain(volume)
+    theta = (pan + 1) * math.pi / 4
+    return gain * math.cos(theta), gain * math.sin(theta)
+
+# Apply volume (and pan, as interleaved stereo) to int16 samples, returning float32 for the mix buffer
+def apply_gain_np(samples, volume, pan=0, stereo=False):
+    if not stereo:
+        return samples * np.float32(volume_to_gain(volume))
+    left_gain, right_gain = pan_gains(volume, pan)
+    left = samples * np.float32(left_gain)
+    right = samples * np.float32(right_gain)
+    return np.stack([left, right], axis=-1).ravel()
+
 # Play a short audio segment (for preview)
 def play_preview(audio_segment, timeout=2.0):
     if not SIMPLEAUDIO_AVAILABLE:
         logging.warning("simpleaudio not available. Skipping preview.")
         return
     try:
-        audio_segment = audio_segment.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+        if audio_segment.channels != 2:
+            audio_segment = ensure_params(audio_segment)
+        elif audio_segment.frame_rate != SAMPLE_RATE or audio_segment.sample_width != 2:
+            audio_segment = audio_segment.set_frame_rate(SAMPLE_RATE).set_sample_width(2)
         if not audio_segment.raw_data:
             logging.warning("Empty audio buffer. Skipping preview.")
             return
-        msg = f"Playing preview (duration: {len(audio_segment)}ms)"
-        logging.info(msg)
-        if RICH_AVAILABLE:
-            console.print(f"[bold cyan]🎵 {msg}[/bold cyan]")
-        else:
-            print(f"🎵 {msg}")
+        say(f"Playing preview (duration: {len(audio_segment)}ms)", "bold cyan", icon="🎵")
         play_obj = sa.play_buffer(
             audio_segment.raw_data,
-            num_channels=1,
+            num_channels=audio_segment.channels,
             bytes_per_sample=2,
             sample_rate=SAMPLE_RATE
         )
-        start_time = time.time()
-        while play_obj.is_playing() and (time.time() - start_time) < timeout:
-            time.sleep(0.01)
-        if play_obj.is_playing():
+        # Block until playback ends; a timer stops it if it runs past the timeout
+        timed_out = threading.Event()
+        def stop_on_timeout():
+            timed_out.set()
             play_obj.stop()
-            msg = "Preview timed out."
-            logging.warning(msg)
-            if RICH_AVAILABLE:
-                console.print("[yellow]⚠️ Preview timed out.[/yellow]")
-            else:
-                print(f"⚠️ {msg}")
+        timer = threading.Timer(timeout, stop_on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            play_obj.wait_done()
+        finally:
+            timer.cancel()
+        if timed_out.is_set():
+            say("Preview timed out.", "yellow", logging.WARNING, icon="⚠️")
         else:
-            msg = "Preview completed."
-            logging.info(msg)
-            if RICH_AVAILABLE:
-                console.print("[green]✅ Preview completed.[/green]")
-            else:
-                print(f"✅ {msg}")
-        play_obj.stop()
-        del play_obj
-        gc.collect()
-        time.sleep(0.1)
+            say("Preview completed.", "green", icon="✅")
     except Exception as e:
-        logging.error(f"Preview failed: {e}")
-        if RICH_AVAILABLE:
-            console.print(f"[red]⚠️ Preview failed: {e}[/red]")
-        else:
-            print(f"⚠️ Preview failed: {e}")
+        say(f"Preview failed: {e}", "red", logging.ERROR, icon="⚠️")
+
+# Collect preview chunks and play them back as one buffer: in the background from start(),
+# or when the block exits; leaving the block waits for background playback to finish
+class PreviewPlayer:
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.chunks = []
+        self.thread = None
+
+    def __enter__(self):
+        return self
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+
+    def play(self, audio):
+        duration = len(audio) / (2 * self.channels * SAMPLE_RATE)
+        play_preview(AudioSegment(audio, frame_rate=SAMPLE_RATE, sample_width=2, channels=self.channels), timeout=duration + 2.0)
+
+    # Start playing what has been written so far while the caller keeps working
+    def start(self):
+        if self.chunks:
+            audio, self.chunks = b''.join(self.chunks), []
+            self.thread = threading.Thread(target=self.play, args=(audio,), daemon=True)
+            self.thread.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.chunks:
+            self.play(b''.join(self.chunks))
+        if self.thread:
+            self.thread.join()
+        return False
 
 # Extend base pattern
 def extend_base_pattern(base_pattern, pattern_length):
@@ -309,6 +565,8 @@ def extend_base_pattern(base_pattern, pattern_length):
 
 # Generate a rhythm pattern
 def generate_pattern(complexity, pattern_length, base_pattern, fill_frequency=0.2):
+    if NUMPY_AVAILABLE:
+        return generate_patterns(complexity, pattern_length, [base_pattern], fill_frequency)[0].tolist()
     base_pattern = extend_base_pattern(base_pattern, pattern_length)
     if complexity == "simple":
         pattern = [1 if random.random() < 0.3 else 0 for _ in range(pattern_length)]
@@ -323,55 +581,282 @@ def generate_pattern(complexity, pattern_length, base_pattern, fill_frequency=0.
     pattern[0] = 1
     return pattern
 
-# Generate MIDI file
+# Generate patterns for several instruments from one batch of random draws
+def generate_patterns(complexity, pattern_length, base_patterns, fill_frequency=0.2):
+    base = np.array([extend_base_pattern(p, pattern_length) for p in base_patterns], dtype=np.uint8)
+    base = base.reshape(len(base_patterns), pattern_length)
+    if complexity == "simple":
+        patterns = (RNG.random(base.shape) < 0.3).astype(np.uint8)
+    else:
+        keep = RNG.random(base.shape) < (0.7 if complexity == "medium" else 0.5)
+        patterns = np.where(keep, base, RNG.integers(0, 2, size=base.shape, dtype=np.uint8))
+        if complexity == "medium":
+            patterns[:, pattern_length // 2] = 1
+        else:
+            patterns[:, pattern_length - 1:0:-int(1 / fill_frequency)] = 1
+    patterns[:, 0] = 1
+    return patterns
+
+# Write value as a MIDI variable-length quantity into buf at offset; returns the offset past it
+def pack_varlen(buf, offset, value):
+    n = 1
+    while value >> (7 * n):
+        n += 1
+    for i in range(n - 1, -1, -1):
+        buf[offset] = ((value >> (7 * i)) & 0x7F) | (0x80 if i else 0)
+        offset += 1
+    return offset
+
+# Generate MIDI file, writing the Standard MIDI File bytes directly
 def generate_midi(instrument_patterns, pattern_length, bpm, note_type, subdivision, output_filename):
-    if not MIDO_AVAILABLE:
-        logging.warning("mido not installed. Skipping MIDI export.")
-        return
     try:
-        midi = mido.MidiFile()
-        track = mido.MidiTrack()
-        midi.tracks.append(track)
-        ticks_per_beat = midi.ticks_per_beat
-        tempo = mido.bpm2tempo(bpm)
-        track.append(mido.MetaMessage('set_tempo', tempo=tempo))
+        ticks_per_beat = 480
+        tempo = int(round(60_000_000 / bpm))
         note_duration = int(ticks_per_beat * NOTE_TYPES[note_type] * (2/3 if subdivision == "triplet" else 1))
-        
-        # Track the last event time to ensure proper timing
+
+        # Every hit becomes a note_on/note_off pair of (time, is_note_off, note), ordered by time
+        if NUMPY_AVAILABLE and instrument_patterns:
+            pattern_matrix = np.array(list(instrument_patterns.values()), dtype=np.uint8)
+            hit_rows, hit_beats = np.nonzero(pattern_matrix)
+            notes = np.repeat(np.array([36 + INSTRUMENT_INDEX[inst] for inst in instrument_patterns])[hit_rows], 2)
+            times = np.repeat(hit_beats * note_duration, 2)
+            times[1::2] += note_duration
+            order = np.argsort(times, kind='stable')
+            events = zip(times[order].tolist(), (order % 2).tolist(), notes[order].tolist())
+            n_events = len(order)
+        else:
+            events = []
+            for inst, pattern in instrument_patterns.items():
+                midi_note = 36 + INSTRUMENT_INDEX[inst]
+                for i, hit in enumerate(pattern):
+                    if hit:
+                        events.append((i * note_duration, 0, midi_note))
+                        events.append((i * note_duration + note_duration, 1, midi_note))
+            events.sort(key=lambda x: x[0])
+            n_events = len(events)
+
+        # Track chunk: set_tempo, the notes (at most 4 delta bytes + 3 message bytes each), end_of_track
+        track = bytearray(7 + 7 * n_events + 4)
+        struct.pack_into('>4B', track, 0, 0x00, 0xFF, 0x51, 0x03)
+        track[4:7] = tempo.to_bytes(3, 'big')
+        offset = 7
         last_time = 0
-        events = []
-        for inst, pattern in instrument_patterns.items():
-            midi_note = 36 + AVAILABLE_INSTRUMENTS.index(inst)
-            for i, hit in enumerate(pattern):
-                if hit:
-                    start_time = i * note_duration
-                    events.append((start_time, mido.Message('note_on', note=midi_note, velocity=100)))
-                    events.append((start_time + note_duration, mido.Message('note_off', note=midi_note, velocity=0)))
-        
-        # Sort events by time
-        events.sort(key=lambda x: x[0])
-        for event_time, msg in events:
-            delta_time = event_time - last_time
-            msg.time = delta_time
-            track.append(msg)
+        last_status = None
+        for event_time, is_off, note in events:
+            offset = pack_varlen(track, offset, event_time - last_time)
+            status = 0x80 if is_off else 0x90
+            # Running status: repeat the status byte only when it changes
+            if status != last_status:
+                track[offset] = status
+                offset += 1
+                last_status = status
+            struct.pack_into('>2B', track, offset, note, 0 if is_off else 100)
+            offset += 2
             last_time = event_time
+        struct.pack_into('>4B', track, offset, 0x00, 0xFF, 0x2F, 0x00)
+        offset += 4
 
-        midi.save(output_filename)
-        msg = f"MIDI exported as: {output_filename}"
-        logging.info(msg)
-        if RICH_AVAILABLE:
-            console.print(f"[green]✅ {msg}[/green]")
-        else:
-            print(f"✅ {msg}")
+        with open(output_filename, 'wb') as midi_file:
+            midi_file.write(struct.pack('>4sIHHH', b'MThd', 6, 1, 1, ticks_per_beat))
+            midi_file.write(struct.pack('>4sI', b'MTrk', offset))
+            midi_file.write(memoryview(track)[:offset])
+        say(f"MIDI exported as: {output_filename}", "green", icon="✅")
     except Exception as e:
-        logging.error(f"MIDI export failed: {e}")
-        if RICH_AVAILABLE:
-            console.print(f"[red]⚠️ MIDI export failed: {e}[/red]")
+        say(f"MIDI export failed: {e}", "red", logging.ERROR, icon="⚠️")
+
+# Mix a hit list into one bar: scale each hit's raw sample by its per-channel gains and sum
+# into float32. Hits must be sorted by start frame; each thread owns one beat of output
+@njit(parallel=True, fastmath=True, cache=True)
+def mix_kernel(bank, hit_starts, hit_ids, hit_gains, n_beats, n_frames):
+    channels = hit_gains.shape[1]
+    total = n_beats * n_frames
+    out = np.zeros(total * channels, dtype=np.float32)
+    for b in prange(n_beats):
+        lo = b * n_frames
+        hi = lo + n_frames
+        # A hit spans one beat, so only hits starting less than a beat before this one can reach it;
+        # the second pass picks up hits that wrap past the end of the bar. Gathering keeps threads from racing
+        for wrap in range(2):
+            shift = wrap * total
+            first = np.searchsorted(hit_starts, lo - n_frames + 1 + shift)
+            last = np.searchsorted(hit_starts, hi + shift)
+            for h in range(first, last):
+                start = hit_starts[h] - shift
+                row = bank[hit_ids[h]]
+                for i in range(max(lo, start), min(hi, start + n_frames)):
+                    value = row[i - start]
+                    for c in range(channels):
+                        out[i * channels + c] += value * hit_gains[h, c]
+    return out
+
+# Add each row into a flat bar at its start position, wrapping the overhang to the front of the bar
+def add_hits(out, rows, starts):
+    total = len(out)
+    for row, start in zip(rows, starts):
+        start %= total
+        end = start + len(row)
+        if end <= total:
+            out[start:end] += row
+        else:
+            out[start:] += row[:total - start]
+            out[:end - total] += row[total - start:]
+
+# Mix one bar with NumPy and repeat it into the full loop
+def mix_loop_np(fitted_samples, pattern, volumes, pan_settings, pattern_length, n_frames, swing_offsets, loop_repeats, preview=False):
+    # Row k of the (instrument, beat) pattern matrix belongs to the k-th instrument in fitted_samples
+    instruments = list(fitted_samples)
+    pattern = np.asarray(pattern, dtype=np.uint8).reshape(len(instruments), pattern_length)
+
+    # Render in stereo only when some instrument is actually panned
+    stereo = any(pan_settings.get(inst, 0) for inst in instruments)
+    channels = 2 if stereo else 1
+    beat_width = n_frames * channels
+
+    # Stack the raw samples into one bank, pick a bank row for every hit and note each instrument's channel gains
+    bank = np.stack([sample for inst in instruments for sample in fitted_samples[inst]])
+    counts = np.array([len(fitted_samples[inst]) for inst in instruments], dtype=np.int64)
+    firsts = np.cumsum(counts) - counts
+    choices = firsts[:, None] + (RNG.random(pattern.shape) * counts[:, None]).astype(np.int64)
+    gains = np.array([pan_gains(volumes.get(inst, DEFAULT_VOLUME), pan_settings.get(inst, 0)) if stereo
+                      else (volume_to_gain(volumes.get(inst, DEFAULT_VOLUME)),) for inst in instruments], dtype=np.float32)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for k, beat_idx in zip(*np.nonzero(pattern)):
+            instrument = instruments[k]
+            logging.debug("Adding %s to beat %d (volume: %s%%, pan: %s)", instrument, beat_idx + 1,
+                          volumes.get(instrument, DEFAULT_VOLUME), pan_settings.get(instrument, 0))
+
+    # Flatten the pattern into a hit list (start frame, bank row, gains), ordered by start
+    hit_rows, hit_beats = np.nonzero(pattern)
+    hit_starts = hit_beats * n_frames + np.asarray(swing_offsets, dtype=np.int64)[hit_beats]
+    order = np.argsort(hit_starts, kind='stable')
+    hit_rows, hit_beats, hit_starts = hit_rows[order], hit_beats[order], hit_starts[order]
+    hit_ids = choices[hit_rows, hit_beats]
+
+    if NUMBA_AVAILABLE:
+        def render(hits):
+            return mix_kernel(bank, hit_starts[hits], hit_ids[hits], gains[hit_rows[hits]], pattern_length, n_frames)
+    else:
+        # Apply volume and pan to every sample once rather than on every hit
+        processed = np.stack([apply_gain_np(sample, volumes.get(inst, DEFAULT_VOLUME), pan_settings.get(inst, 0), stereo)
+                              for inst in instruments for sample in fitted_samples[inst]])
+        def render(hits):
+            out = np.zeros(pattern_length * beat_width, dtype=np.float32)
+            add_hits(out, processed[hit_ids[hits]], hit_starts[hits] * channels)
+            return out
+
+    # Render each instrument once and accumulate it into one float32 mix, so summed layers never clip;
+    # the per-instrument renders double as the stems. Then normalize the whole bar and quantize once
+    mix = np.zeros(pattern_length * beat_width, dtype=np.float32)
+    layers = []
+    for k in range(len(instruments)):
+        layer = render(hit_rows == k)
+        np.add(mix, layer, out=mix)
+        layers.append(layer)
+    normalize_np(mix)
+    bar = mix.astype(np.int16)
+
+    beats_with_content = np.flatnonzero(pattern.any(axis=0)).tolist()
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for beat_idx in range(pattern_length):
+            logging.debug("Beat %d: %dms, has_content: %s", beat_idx + 1, n_frames * 1000 // SAMPLE_RATE, beat_idx in beats_with_content)
+    # The preview plays as soon as the bar is mixed while the loop and stems are assembled
+    with PreviewPlayer(channels) as player:
+        if preview:
+            for beat_idx in beats_with_content:
+                player.write(bar[beat_idx * beat_width:(beat_idx + 1) * beat_width])
+            player.start()
+
+        # Repeat the bar straight into the loop's buffer
+        loop = np_to_seg(bar, channels, loop_repeats)
+
+        # Stems keep the bar's timeline: every hit lands where it does in the mix, silence elsewhere
+        instrument_stems = {}
+        for instrument, layer in zip(instruments, layers):
+            # Stems are not normalized here (export does that), so quantize with a clip
+            np.clip(layer, -32768, 32767, out=layer)
+            instrument_stems[instrument] = np_to_seg(layer.astype(np.int16), channels, loop_repeats)
+    return loop, instrument_stems
+
+# Add a hit to its beat shifted by offset_bytes; the part pushed past the beat's edge lands in the neighbouring beat
+def add_swung_hit(beats, beat_idx, hit, offset_bytes):
+    if offset_bytes == 0:
+        beats[beat_idx] = audioop.add(beats[beat_idx], hit, 2)
+        return
+    size = len(hit)
+    shift = abs(offset_bytes)
+    if offset_bytes > 0:
+        own = b'\x00' * shift + hit[:size - shift]
+        spill, neighbour = hit[size - shift:] + b'\x00' * (size - shift), (beat_idx + 1) % len(beats)
+    else:
+        own = hit[shift:] + b'\x00' * shift
+        spill, neighbour = b'\x00' * (size - shift) + hit[:shift], (beat_idx - 1) % len(beats)
+    beats[beat_idx] = audioop.add(beats[beat_idx], own, 2)
+    beats[neighbour] = audioop.add(beats[neighbour], spill, 2)
+
+# Mix one bar with audioop on raw bytes when NumPy is not installed
+def mix_loop_audioop(fitted_samples, instrument_patterns, volumes, pan_settings, pattern_length, n_frames, swing_offsets, loop_repeats, preview=False):
+    stereo = any(pan_settings.get(inst, 0) for inst in fitted_samples)
+    channels = 2 if stereo else 1
+    beat_bytes = n_frames * 2 * channels
+
+    # Resolve every per-instrument lookup once into lists indexed by instrument position
+    inst_list = list(fitted_samples)
+    vol_list = [volumes.get(inst, DEFAULT_VOLUME) for inst in inst_list]
+    pan_list = [pan_settings.get(inst, 0) for inst in inst_list]
+    pat_list = [instrument_patterns.get(inst, [0] * pattern_length) for inst in inst_list]
+
+    # Apply volume and pan to every sample once, outside the beat loop
+    samples_by_idx = []
+    for samples, volume, pan in zip(fitted_samples.values(), vol_list, pan_list):
+        if stereo:
+            left_gain, right_gain = pan_gains(volume, pan)
+            samples_by_idx.append([audioop.tostereo(s, 2, left_gain, right_gain) for s in samples])
+        elif volume != 100:
+            samples_by_idx.append([audioop.mul(s, 2, volume_to_gain(volume)) for s in samples])
         else:
-            print(f"⚠️ MIDI export failed: {e}")
+            samples_by_idx.append(samples)
+
+    # Every untouched beat, in the mix and in each stem, shares one immutable silent buffer
+    silence = bytes(beat_bytes)
+    beat_layers = [silence] * pattern_length
+    stems_by_idx = [[silence] * pattern_length for _ in inst_list]
+    beats_with_content = []
+    for beat_idx in range(pattern_length):
+        offset_bytes = swing_offsets[beat_idx] * 2 * channels
+        has_content = False
+        for k in range(len(inst_list)):
+            if pat_list[k][beat_idx]:
+                hit = choose_sample(samples_by_idx[k])
+                add_swung_hit(beat_layers, beat_idx, hit, offset_bytes)
+                add_swung_hit(stems_by_idx[k], beat_idx, hit, offset_bytes)
+                has_content = True
+                logging.debug("Adding %s to beat %d (volume: %s%%, pan: %s)", inst_list[k], beat_idx + 1, vol_list[k], pan_list[k])
+        if has_content:
+            beats_with_content.append(beat_idx)
+
+    # Normalize the whole bar once
+    bar = b''.join(beat_layers)
+    peak = audioop.max(bar, 2)
+    if peak:
+        bar = audioop.mul(bar, 2, 32768 * 10 ** (-0.1 / 20) / peak)
+    with PreviewPlayer(channels) as player:
+        if preview:
+            for beat_idx in beats_with_content:
+                player.write(bar[beat_idx * beat_bytes:(beat_idx + 1) * beat_bytes])
+            player.start()
+
+        loop = AudioSegment(bar * loop_repeats, frame_rate=SAMPLE_RATE, sample_width=2, channels=channels)
+        instrument_stems = {
+            inst: AudioSegment(b''.join(parts) * loop_repeats, frame_rate=SAMPLE_RATE, sample_width=2, channels=channels)
+            for inst, parts in zip(inst_list, stems_by_idx)
+        }
+    return loop, instrument_stems
 
 # Generate the rhythm loop
 def generate_rhythm(style, instruments, bpm, note_type, swing, complexity, volumes, pattern_length, time_signature, subdivision, fill_frequency, master_volume, pan_settings, loop_repeats, preview=False):
+    # One entry per instrument, so pattern rows, patterns and samples share a single index space;
+    # this also leaves the caller's list alone when failed instruments are removed below
+    instruments = list(dict.fromkeys(instruments))
     logging.info(f"Generating rhythm | Style: {style} | BPM: {bpm} | Instruments: {instruments}")
     
     # Display configuration
@@ -429,30 +914,24 @@ def generate_rhythm(style, instruments, bpm, note_type, swing, complexity, volum
     beat_duration_ms = int(60000 / bpm * NOTE_TYPES[note_type])
     if subdivision == "triplet":
         beat_duration_ms = int(beat_duration_ms * 2 / 3)
-    msg = f"Tempo: {bpm} BPM | Beat duration: {beat_duration_ms}ms"
-    logging.info(msg)
-    if RICH_AVAILABLE:
-        console.print(f"[bold]{msg}[/bold]")
-    else:
-        print(msg)
+    say(f"Tempo: {bpm} BPM | Beat duration: {beat_duration_ms}ms", "bold")
 
     # Get style-specific pattern
     base_patterns = STYLE_CONFIGS[style]["pattern"]
-    instrument_patterns = {}
-    for inst in instruments:
-        base_pattern = base_patterns.get(inst, [0] * 8)
-        instrument_patterns[inst] = generate_pattern(complexity, pattern_length, base_pattern, fill_frequency)
-    msg = f"Patterns: {instrument_patterns}"
-    logging.info(msg)
-    if RICH_AVAILABLE:
-        console.print(f"[bold]{msg}[/bold]")
+    if NUMPY_AVAILABLE:
+        # One (instrument, beat) matrix feeds the mixer; the dict of lists is kept for display, MIDI and callers
+        pattern_matrix = generate_patterns(complexity, pattern_length, [base_patterns.get(inst, [0] * 8) for inst in instruments], fill_frequency)
+        instrument_patterns = {inst: row.tolist() for inst, row in zip(instruments, pattern_matrix)}
     else:
-        print(msg)
+        instrument_patterns = {inst: generate_pattern(complexity, pattern_length, base_patterns.get(inst, [0] * 8), fill_frequency) for inst in instruments}
+    say(f"Patterns: {instrument_patterns}", "bold")
 
-    # Load samples
+    # Load samples, reading each instrument's folder in parallel
+    with ThreadPoolExecutor(max_workers=min(8, max(len(instruments), 1))) as executor:
+        loaded = dict(zip(instruments, executor.map(load_samples, instruments)))
     instrument_samples = {}
     for inst in list(instruments):  # Create a copy to allow modification
-        samples = load_samples(inst)
+        samples = loaded[inst]
         if samples:
             instrument_samples[inst] = samples
         else:
@@ -461,137 +940,119 @@ def generate_rhythm(style, instruments, bpm, note_type, swing, complexity, volum
         logging.error("No valid instruments. Generating silent loop.")
         return create_silent_segment(pattern_length * beat_duration_ms * loop_repeats), {}
 
-    # Create the rhythm loop
-    beat_layers = []
-    instrument_stems = {inst: create_silent_segment(0) for inst in instruments}
-    for beat_idx in range(pattern_length):
-        beat_layer = create_silent_segment(beat_duration_ms)
-        has_content = False
-        for instrument in instrument_samples:
-            if instrument in instrument_patterns and instrument_patterns[instrument][beat_idx]:
-                sample = choose_sample(instrument_samples[instrument])
-                volume = volumes.get(instrument, DEFAULT_VOLUME)
-                sample = apply_volume(sample, volume)
-                pan = pan_settings.get(instrument, 0)
-                sample = apply_panning(sample, pan)
-                if len(sample) < beat_duration_ms:
-                    sample = sample + create_silent_segment(beat_duration_ms - len(sample))
-                elif len(sample) > beat_duration_ms:
-                    sample = sample[:beat_duration_ms]
-                try:
-                    beat_layer = beat_layer.overlay(sample, gain_during_overlay=-6)  # Prevent clipping
-                    stem_segment = create_silent_segment(beat_duration_ms)
-                    stem_segment = stem_segment.overlay(sample)
-                    instrument_stems[instrument] = instrument_stems[instrument] + stem_segment
-                    has_content = True
-                    msg = f"Adding {instrument} to beat {beat_idx + 1} (volume: {volume}%, pan: {pan})"
-                    logging.info(msg)
-                    if RICH_AVAILABLE:
-                        console.print(f"[bold]🥁 {msg}[/bold]")
-                    else:
-                        print(f"🥁 {msg}")
-                except Exception as e:
-                    logging.error(f"Failed to overlay {instrument}: {e}")
-                    if RICH_AVAILABLE:
-                        console.print(f"[red]⚠️ Failed to overlay {instrument}: {e}[/red]")
-                    else:
-                        print(f"⚠️ Failed to overlay {instrument}: {e}")
-        try:
-            beat_layer = normalize(beat_layer.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2))
-            msg = f"Beat {beat_idx + 1}: {len(beat_layer)}ms, has_content: {has_content}"
-            logging.info(msg)
-            if RICH_AVAILABLE:
-                console.print(f"[cyan]🔊 {msg}[/cyan]")
-            else:
-                print(f"🔊 {msg}")
-        except Exception as e:
-            logging.error(f"Failed to normalize beat {beat_idx + 1}: {e}")
-            beat_layer = create_silent_segment(beat_duration_ms)
-            has_content = False
-        if preview and has_content:
-            play_preview(beat_layer)
-        beat_layers.append(beat_layer)
-        del beat_layer
-        gc.collect()
-
-    # Concatenate and repeat loop
-    loop = create_silent_segment(0)
-    for _ in range(loop_repeats):
-        for beat_layer in beat_layers:
-            loop = loop + beat_layer
-    loop = apply_volume(loop, master_volume)
-    expected_duration = pattern_length * beat_duration_ms * loop_repeats
-    if len(loop) < expected_duration:
-        loop = loop + create_silent_segment(expected_duration - len(loop))
-    msg = f"Generated loop duration: {len(loop)}ms"
-    logging.info(msg)
-    if RICH_AVAILABLE:
-        console.print(f"[green]✅ {msg}[/green]")
+    n_frames = int(SAMPLE_RATE * beat_duration_ms / 1000)
+    offsets = swing_offsets(swing, beat_duration_ms, pattern_length)
+    # Trim or pad every sample to exactly one beat once, not on every hit
+    fitted_samples = {inst: [fit_to_frames(s, n_frames) for s in samples] for inst, samples in instrument_samples.items()}
+
+    if NUMPY_AVAILABLE:
+        # Keep only the rows of instruments that made it through loading
+        keep = [k for k, inst in enumerate(instrument_patterns) if inst in fitted_samples]
+        loop, instrument_stems = mix_loop_np(fitted_samples, pattern_matrix[keep], volumes, pan_settings, pattern_length, n_frames, offsets, loop_repeats, preview)
     else:
-        print(f"✅ {msg}")
+        loop, instrument_stems = mix_loop_audioop(fitted_samples, instrument_patterns, volumes, pan_settings, pattern_length, n_frames, offsets, loop_repeats, preview)
+    loop = apply_volume(loop, master_volume)
+    say(f"Generated loop duration: {len(loop)}ms", "green", icon="✅")
     return loop, instrument_stems, instrument_patterns
 
-# Export rhythm, stems, and MIDI
-def export_rhythm(loop, instrument_stems, instrument_patterns, style, bpm, note_type, pattern_length, output_format, export_stems, export_midi, project_name, loop_repeats, subdivision):
+# Resolve the output directory, timestamp and usable format (MP3 needs FFmpeg) ahead of export
+def prepare_export(output_format):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_dir = "output"
     os.makedirs(output_dir, exist_ok=True)
-    output_filename = os.path.join(output_dir, f"{project_name}_{style}_{timestamp}.{output_format}")
-    
     if output_format == "mp3" and not check_ffmpeg():
         output_format = "wav"
-        output_filename = output_filename.replace(".mp3", ".wav")
+    return output_dir, timestamp, output_format
 
+# Normalize and write one stem, reporting the outcome
+def export_stem(inst, stem, stem_filename, output_format):
     try:
-        loop = normalize(loop.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2))
-        loop.export(output_filename, format=output_format)
-        msg = f"Rhythm exported as: {output_filename}"
-        logging.info(msg)
-        if RICH_AVAILABLE:
-            console.print(f"[green]✅ {msg}[/green]")
-        else:
-            print(f"✅ {msg}")
+        write_audio(stem_filename, output_format, normalize(stem))
+        say(f"Stem exported as: {stem_filename}", "green", icon="✅")
     except Exception as e:
-        logging.error(f"Export failed: {e}")
-        if RICH_AVAILABLE:
-            console.print(f"[red]⚠️ Export failed: {e}[/red]")
-        else:
-            print(f"⚠️ Export failed: {e}")
+        say(f"Stem export failed for {inst}: {e}", "red", logging.ERROR, icon="⚠️")
+
+# Export rhythm, stems, and MIDI
+def export_rhythm(loop, instrument_stems, instrument_patterns, style, bpm, note_type, pattern_length, output_format, export_stems, export_midi, project_name, subdivision, prepared=None):
+    output_dir, timestamp, output_format = prepared or prepare_export(output_format)
+    output_filename = os.path.join(output_dir, f"{project_name}_{style}_{timestamp}.{output_format}")
+
+    try:
+        loop = normalize(loop)
+        write_audio(output_filename, output_format, loop)
+        say(f"Rhythm exported as: {output_filename}", "green", icon="✅")
+    except Exception as e:
+        say(f"Export failed: {e}", "red", logging.ERROR, icon="⚠️")
         return
 
-    if export_stems:
-        for inst, stem in instrument_stems.items():
+    # Stems and MIDI are independent files, so write them concurrently once the main loop is on disk
+    stems = instrument_stems.items() if export_stems else ()
+    with ThreadPoolExecutor(max_workers=min(8, len(stems) + 1)) as executor:
+        for inst, stem in stems:
             stem_filename = os.path.join(output_dir, f"{project_name}_{style}_{inst}_{timestamp}.{output_format}")
-            try:
-                stem = normalize(stem.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2))
-                stem = stem * loop_repeats
-                stem.export(stem_filename, format=output_format)
-                msg = f"Stem exported as: {stem_filename}"
-                logging.info(msg)
-                if RICH_AVAILABLE:
-                    console.print(f"[green]✅ {msg}[/green]")
-                else:
-                    print(f"✅ {msg}")
-            except Exception as e:
-                logging.error(f"Stem export failed for {inst}: {e}")
-                if RICH_AVAILABLE:
-                    console.print(f"[red]⚠️ Stem export failed for {inst}: {e}[/red]")
-                else:
-                    print(f"⚠️ Stem export failed for {inst}: {e}")
-
-    if export_midi:
-        midi_filename = os.path.join(output_dir, f"{project_name}_{style}_{timestamp}.mid")
-        generate_midi(instrument_patterns, pattern_length, bpm, note_type, subdivision, midi_filename)
+            executor.submit(export_stem, inst, stem, stem_filename, output_format)
+        if export_midi:
+            midi_filename = os.path.join(output_dir, f"{project_name}_{style}_{timestamp}.mid")
+            executor.submit(generate_midi, instrument_patterns, pattern_length, bpm, note_type, subdivision, midi_filename)
 
     if SIMPLEAUDIO_AVAILABLE:
         try:
             play_preview(loop, timeout=10.0)
         except Exception as e:
-            logging.error(f"Playback failed: {e}")
-            if RICH_AVAILABLE:
-                console.print(f"[red]⚠️ Playback failed: {e}[/red]")
-            else:
-                print(f"⚠️ Playback failed: {e}")
+            say(f"Playback failed: {e}", "red", logging.ERROR, icon="⚠️")
+
+# Locate the cached render for a set of generate_rhythm arguments; every sample WAV's name, size and mtime
+# is part of the key, so adding, removing or editing a sample in place invalidates the render
+def render_cache_path(params):
+    signature = []
+    if os.path.isdir("samples"):
+        for folder_path in folder_index("samples").values():
+            with os.scandir(folder_path) as it:
+                signature.extend((folder_path, e.name, e.stat().st_size, e.stat().st_mtime_ns)
+                                 for e in it if e.is_file() and e.name.lower().endswith('.wav'))
+        signature.sort()
+    key = hashlib.blake2b(json.dumps([RENDER_CACHE_VERSION, params, signature], sort_keys=True).encode(), digest_size=16).hexdigest()
+    return os.path.join(RENDER_CACHE_DIR, f"{key}.npz")
+
+# Load a cached (loop, stems, patterns) render, or None on a miss
+def load_cached_render(cache_path):
+    if not NUMPY_AVAILABLE or not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as data:
+            channels = int(data["channels"])
+            loop = np_to_seg(data["loop"], channels)
+            stems = {name: np_to_seg(data[f"stem_{i}"], channels) for i, name in enumerate(data["stem_names"].tolist())}
+            patterns = json_loads(str(data["patterns"]))
+        os.utime(cache_path)  # Mark as recently used so eviction keeps it
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        logging.warning(f"Ignoring unreadable render cache {cache_path}: {e}")
+        return None
+    return loop, stems, patterns
+
+# Store a render in the cache, evicting the least recently used entries beyond RENDER_CACHE_SIZE
+def save_cached_render(cache_path, loop, stems, patterns):
+    if not NUMPY_AVAILABLE:
+        return
+    arrays = {f"stem_{i}": seg_to_np(stem) for i, stem in enumerate(stems.values())}
+    try:
+        os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+        # Write to a temp file and move it into place, so an interrupted run never leaves a truncated entry
+        fd, temp_path = tempfile.mkstemp(dir=RENDER_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, loop=seg_to_np(loop), channels=loop.channels,
+                                    stem_names=np.array(list(stems), dtype=str), patterns=json.dumps(patterns), **arrays)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        with os.scandir(RENDER_CACHE_DIR) as it:
+            entries = sorted((e for e in it if e.name.endswith(".npz")), key=lambda e: e.stat().st_mtime_ns, reverse=True)
+        for entry in entries[RENDER_CACHE_SIZE:]:
+            os.remove(entry.path)
+    except OSError as e:
+        logging.warning(f"Could not write render cache {cache_path}: {e}")
 
 # Main interactive function
 def main():
@@ -602,6 +1063,8 @@ def main():
     parser.add_argument('--export-midi', action='store_true', help="Export MIDI")
     parser.add_argument('--output-format', choices=['wav', 'mp3'], default='wav', help="Output format")
     parser.add_argument('--debug', action='store_true', help="Enable debug logging")
+    parser.add_argument('--no-prompt', action='store_true', help="Skip interactive prompts and use the defaults")
+    parser.add_argument('--reuse-render', action='store_true', help="Reuse the cached render of an identical config instead of regenerating")
     args = parser.parse_args()
 
     setup_logging(args.debug)
@@ -628,187 +1091,188 @@ def main():
     # Load config from file
     if args.config and os.path.exists(args.config):
         try:
-            with open(args.config, 'r') as f:
-                config.update(json.load(f))
-            msg = f"Loaded config from {args.config}"
-            logging.info(msg)
-            if RICH_AVAILABLE:
-                console.print(f"[green]✅ {msg}[/green]")
-            else:
-                print(f"✅ {msg}")
+            with open(args.config, 'rb') as f:
+                config.update(json_loads(f.read()))
+            say(f"Loaded config from {args.config}", "green", icon="✅")
         except Exception as e:
-            logging.error(f"Failed to load config: {e}")
-            if RICH_AVAILABLE:
-                console.print(f"[red]⚠️ Failed to load config: {e}. Using defaults.[/red]")
-            else:
-                print(f"⚠️ Failed to load config: {e}. Using defaults.")
-
-    # Interactive input
-    if not args.config:
-        msg = "🎵 Quantum Love Rhythm Generator 🎵"
-        if RICH_AVAILABLE:
-            console.print(f"[bold magenta]{msg}[/bold magenta]")
-        else:
-            print(msg)
-        print(f"Available styles: {', '.join(STYLE_CONFIGS.keys())}")
-        print(f"Available instruments: {', '.join(AVAILABLE_INSTRUMENTS)}")
-        print(f"Available note types: {', '.join(NOTE_TYPES.keys())}")
-        print(f"Available time signatures: {', '.join(TIME_SIGNATURES)}")
-        print(f"Available subdivisions: {', '.join(SUBDIVISIONS)}")
-
-        def get_valid_input(prompt, default, validator, type_cast, error_msg="Invalid input. Please try again."):
-            while True:
-                value = input(f"{prompt} [{default}]: ").strip() or default
-                try:
-                    if validator(value):
-                        return type_cast(value)
-                    print(error_msg)
-                except ValueError:
-                    print(f"Invalid input. Please enter a valid value.")
-
-        config["style"] = get_valid_input(
-            "Choose a style",
-            config["style"],
-            lambda x: x in STYLE_CONFIGS,
-            str,
-            "Invalid style. Choose from: " + ", ".join(STYLE_CONFIGS.keys())
-        )
-        config["instruments"] = get_valid_input(
-            "Enter instruments (comma-separated)",
-            ",".join(config["instruments"]),
-            lambda x: x.strip() and all(i.strip() in AVAILABLE_INSTRUMENTS for i in x.split(',')),
-            lambda x: [i.strip() for i in x.split(',')],
-            "Invalid instruments. Choose from: " + ", ".join(AVAILABLE_INSTRUMENTS)
-        )
-        config["bpm"] = get_valid_input(
-            f"Enter BPM ({MIN_BPM}-{MAX_BPM})",
-            config["bpm"],
-            lambda x: MIN_BPM <= int(x) <= MAX_BPM,
-            int,
-            f"BPM must be between {MIN_BPM} and {MAX_BPM}."
-        )
-        config["note_type"] = get_valid_input(
-            "Choose note type",
-            config["note_type"],
-            lambda x: x in NOTE_TYPES,
-            str,
-            "Invalid note type. Choose from: " + ", ".join(NOTE_TYPES.keys())
-        )
-        config["swing"] = get_valid_input(
-            f"Enter swing percentage ({MIN_SWING}-{MAX_SWING})",
-            config["swing"],
-            lambda x: MIN_SWING <= int(x) <= MAX_SWING,
-            int,
-            f"Swing must be between {MIN_SWING} and {MAX_SWING}."
-        )
-        config["complexity"] = get_valid_input(
-            "Choose complexity",
-            config["complexity"],
-            lambda x: x in COMPLEXITY_LEVELS,
-            str,
-            "Invalid complexity. Choose from: " + ", ".join(COMPLEXITY_LEVELS)
-        )
-        config["pattern_length"] = get_valid_input(
-            "Enter pattern length (4-16)",
-            config["pattern_length"],
-            lambda x: 4 <= int(x) <= 16,
-            int,
-            "Pattern length must be between 4 and 16."
-        )
-        config["time_signature"] = get_valid_input(
-            "Choose time signature",
-            config["time_signature"],
-            lambda x: x in TIME_SIGNATURES,
-            str,
-            "Invalid time signature. Choose from: " + ", ".join(TIME_SIGNATURES)
-        )
-        config["subdivision"] = get_valid_input(
-            "Choose subdivision",
-            config["subdivision"],
-            lambda x: x in SUBDIVISIONS,
-            str,
-            "Invalid subdivision. Choose from: " + ", ".join(SUBDIVISIONS)
-        )
-        config["fill_frequency"] = get_valid_input(
-            "Enter fill frequency (0.0-1.0)",
-            config["fill_frequency"],
-            lambda x: 0.0 <= float(x) <= 1.0,
-            float,
-            "Fill frequency must be between 0.0 and 1.0."
-        )
-        config["master_volume"] = get_valid_input(
-            "Enter master volume (0-100)",
-            config["master_volume"],
-            lambda x: 0 <= int(x) <= 100,
-            int,
-            "Master volume must be between 0 and 100."
-        )
-        config["loop_repeats"] = get_valid_input(
-            "Enter loop repeats (1-10)",
-            config["loop_repeats"],
-            lambda x: 1 <= int(x) <= 10,
-            int,
-            "Loop repeats must be between 1 and 10."
-        )
-        config["project_name"] = get_valid_input(
-            "Enter project name",
-            config["project_name"],
-            lambda x: x.strip() and not any(c in x for c in r'<>:"/\|?*'),
-            str,
-            "Invalid project name. Avoid special characters like <>:\"/\\|?*"
-        )
-        config["volumes"] = {}
-        config["pan_settings"] = {}
-        for inst in config["instruments"]:
-            config["volumes"][inst] = get_valid_input(
-                f"Enter volume for {inst} (0-100)",
-                config["volumes"].get(inst, DEFAULT_VOLUME),
-                lambda x: 0 <= int(x) <= 100,
+            say(f"Failed to load config: {e}. Using defaults.", "red", logging.ERROR, icon="⚠️")
+
+    # Interactive input, only when no config was given and prompting was not turned off
+    if not args.config and not args.no_prompt:
+        # Decode the sample folders while the user types, so rendering starts from a warm cache;
+        # anything the workers log is shown once the prompts are done
+        warmer = ThreadPoolExecutor(max_workers=8)
+        CONSOLE_HANDLER.hold_worker_output()
+        completed = False
+        try:
+            for inst in instruments_with_samples():
+                warmer.submit(load_samples, inst)
+            msg = "🎵 Quantum Love Rhythm Generator 🎵"
+            echo(msg, "bold magenta")
+            print(f"Available styles: {', '.join(STYLE_CONFIGS.keys())}")
+            print(f"Available instruments: {', '.join(AVAILABLE_INSTRUMENTS)}")
+            print(f"Available note types: {', '.join(NOTE_TYPES.keys())}")
+            print(f"Available time signatures: {', '.join(TIME_SIGNATURES)}")
+            print(f"Available subdivisions: {', '.join(SUBDIVISIONS)}")
+
+            def get_valid_input(prompt, default, validator, type_cast, error_msg="Invalid input. Please try again."):
+                while True:
+                    value = input(f"{prompt} [{default}]: ").strip() or default
+                    try:
+                        if validator(value):
+                            return type_cast(value)
+                        print(error_msg)
+                    except ValueError:
+                        print(f"Invalid input. Please enter a valid value.")
+
+            config["style"] = get_valid_input(
+                "Choose a style",
+                config["style"],
+                lambda x: x in STYLE_CONFIGS,
+                str,
+                "Invalid style. Choose from: " + ", ".join(STYLE_CONFIGS.keys())
+            )
+            config["instruments"] = get_valid_input(
+                "Enter instruments (comma-separated)",
+                ",".join(config["instruments"]),
+                lambda x: x.strip() and all(i.strip() in AVAILABLE_INSTRUMENT_SET for i in x.split(',')),
+                lambda x: [i.strip() for i in x.split(',')],
+                "Invalid instruments. Choose from: " + ", ".join(AVAILABLE_INSTRUMENTS)
+            )
+            config["bpm"] = get_valid_input(
+                f"Enter BPM ({MIN_BPM}-{MAX_BPM})",
+                config["bpm"],
+                lambda x: MIN_BPM <= int(x) <= MAX_BPM,
+                int,
+                f"BPM must be between {MIN_BPM} and {MAX_BPM}."
+            )
+            config["note_type"] = get_valid_input(
+                "Choose note type",
+                config["note_type"],
+                lambda x: x in NOTE_TYPES,
+                str,
+                "Invalid note type. Choose from: " + ", ".join(NOTE_TYPES.keys())
+            )
+            config["swing"] = get_valid_input(
+                f"Enter swing percentage ({MIN_SWING}-{MAX_SWING})",
+                config["swing"],
+                lambda x: MIN_SWING <= int(x) <= MAX_SWING,
                 int,
-                "Volume must be between 0 and 100."
+                f"Swing must be between {MIN_SWING} and {MAX_SWING}."
+            )
+            config["complexity"] = get_valid_input(
+                "Choose complexity",
+                config["complexity"],
+                lambda x: x in COMPLEXITY_LEVELS,
+                str,
+                "Invalid complexity. Choose from: " + ", ".join(COMPLEXITY_LEVELS)
             )
-            config["pan_settings"][inst] = get_valid_input(
-                f"Enter pan for {inst} (-1.0 to 1.0)",
-                config["pan_settings"].get(inst, 0),
-                lambda x: -1.0 <= float(x) <= 1.0,
+            config["pattern_length"] = get_valid_input(
+                "Enter pattern length (4-16)",
+                config["pattern_length"],
+                lambda x: 4 <= int(x) <= 16,
+                int,
+                "Pattern length must be between 4 and 16."
+            )
+            config["time_signature"] = get_valid_input(
+                "Choose time signature",
+                config["time_signature"],
+                lambda x: x in TIME_SIGNATURES,
+                str,
+                "Invalid time signature. Choose from: " + ", ".join(TIME_SIGNATURES)
+            )
+            config["subdivision"] = get_valid_input(
+                "Choose subdivision",
+                config["subdivision"],
+                lambda x: x in SUBDIVISIONS,
+                str,
+                "Invalid subdivision. Choose from: " + ", ".join(SUBDIVISIONS)
+            )
+            config["fill_frequency"] = get_valid_input(
+                "Enter fill frequency (0.0-1.0)",
+                config["fill_frequency"],
+                lambda x: 0.0 <= float(x) <= 1.0,
                 float,
-                "Pan must be between -1.0 and 1.0."
+                "Fill frequency must be between 0.0 and 1.0."
+            )
+            config["master_volume"] = get_valid_input(
+                "Enter master volume (0-100)",
+                config["master_volume"],
+                lambda x: 0 <= int(x) <= 100,
+                int,
+                "Master volume must be between 0 and 100."
+            )
+            config["loop_repeats"] = get_valid_input(
+                "Enter loop repeats (1-10)",
+                config["loop_repeats"],
+                lambda x: 1 <= int(x) <= 10,
+                int,
+                "Loop repeats must be between 1 and 10."
+            )
+            config["project_name"] = get_valid_input(
+                "Enter project name",
+                config["project_name"],
+                valid_project_name,
+                str,
+                "Invalid project name. Avoid special characters like <>:\"/\\|?*"
             )
+            # Offer the current per-instrument settings as defaults, keeping only the chosen instruments
+            previous_volumes, previous_pans = config["volumes"], config["pan_settings"]
+            volumes = config["volumes"] = {}
+            pans = config["pan_settings"] = {}
+            for inst in config["instruments"]:
+                volumes[inst] = get_valid_input(
+                    f"Enter volume for {inst} (0-100)",
+                    previous_volumes.get(inst, DEFAULT_VOLUME),
+                    valid_volume,
+                    int,
+                    "Volume must be between 0 and 100."
+                )
+                pans[inst] = get_valid_input(
+                    f"Enter pan for {inst} (-1.0 to 1.0)",
+                    previous_pans.get(inst, 0),
+                    valid_pan,
+                    float,
+                    "Pan must be between -1.0 and 1.0."
+                )
+            completed = True
+        finally:
+            # On an error or Ctrl-C, drop the loads that have not started rather than waiting for them
+            warmer.shutdown(wait=completed, cancel_futures=not completed)
+            CONSOLE_HANDLER.release_worker_output()
 
     # Validate instruments
-    config["instruments"] = [i for i in config["instruments"] if i in AVAILABLE_INSTRUMENTS]
+    config["instruments"] = list(dict.fromkeys(i for i in config["instruments"] if i in AVAILABLE_INSTRUMENT_SET))
     if not config["instruments"]:
         logging.warning("No valid instruments. Using default: kick, snare.")
         config["instruments"] = ["kick", "snare"]
-        config["volumes"] = {inst: DEFAULT_VOLUME for inst in config["instruments"]}
-        config["pan_settings"] = {inst: 0 for inst in config["instruments"]}
-    msg = f"Selected instruments: {config['instruments']}"
-    logging.info(msg)
-    if RICH_AVAILABLE:
-        console.print(f"[green]✅ {msg}[/green]")
+        config["volumes"] = dict.fromkeys(config["instruments"], DEFAULT_VOLUME)
+        config["pan_settings"] = dict.fromkeys(config["instruments"], 0)
     else:
-        print(f"✅ {msg}")
-
-    # Generate and export rhythm
-    loop, stems, patterns = generate_rhythm(
-        style=config["style"],
-        instruments=config["instruments"],
-        bpm=config["bpm"],
-        note_type=config["note_type"],
-        swing=config["swing"],
-        complexity=config["complexity"],
-        volumes=config["volumes"],
-        pattern_length=config["pattern_length"],
-        time_signature=config["time_signature"],
-        subdivision=config["subdivision"],
-        fill_frequency=config["fill_frequency"],
-        master_volume=config["master_volume"],
-        pan_settings=config["pan_settings"],
-        loop_repeats=config["loop_repeats"],
-        preview=args.preview
-    )
-    if len(loop) == 0:
-        logging.error("Generated loop is empty. Check sample files and dependencies.")
+        # Drop settings for instruments that are not being played
+        config["volumes"] = {k: config["volumes"][k] for k in config["instruments"] if k in config["volumes"]}
+        config["pan_settings"] = {k: config["pan_settings"][k] for k in config["instruments"] if k in config["pan_settings"]}
+    say(f"Selected instruments: {config['instruments']}", "green", icon="✅")
+
+    # Run the export setup (output folder, FFmpeg check) on a worker thread while the rhythm renders here;
+    # rendering stays on the main thread so Numba's parallel pool is owned by it
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prepared_future = executor.submit(prepare_export, args.output_format)
+        render_params = {key: config[key] for key in RENDER_KEYS}
+        # Patterns are random, so a previous render is only reused when asked for
+        cache_path = render_cache_path(render_params) if args.reuse_render else None
+        cached = load_cached_render(cache_path) if cache_path else None
+        if cached:
+            say(f"Reusing cached render: {cache_path}", "green", icon="✅")
+            loop, stems, patterns = cached
+        else:
+            loop, stems, patterns = generate_rhythm(**render_params, preview=args.preview)
+            if cache_path and len(loop):
+                save_cached_render(cache_path, loop, stems, patterns)
+        prepared = prepared_future.result()
+    # A loop of all zeros is as useless as an empty one; audioop's max peak scans it in C
+    if len(loop) == 0 or loop.max == 0:
+        logging.error("Generated loop is empty or silent; aborting export. Check sample files and dependencies.")
         return
     export_rhythm(
         loop,
@@ -822,8 +1286,8 @@ def main():
         export_stems=args.export_stems,
         export_midi=args.export_midi,
         project_name=config["project_name"],
-        loop_repeats=config["loop_repeats"],
-        subdivision=config["subdivision"]
+        subdivision=config["subdivision"],
+        prepared=prepared
     )
 
 if __name__ == '__main__':
@@ -3,6 +3,24 @@ import time
 from mido import Message, MidiFile, MidiTrack
 from midi2audio import FluidSynth
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    # Without Numba the kernels run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 # Set your SoundFont file here
 SOUNDFONT_PATH = "FluidR3_GM.sf2"
 
@@ -40,6 +58,8 @@ NOTE_TO_MIDI = {
     "G": 67, "G#": 68, "A": 69, "A#": 70, "B": 71
 }
 
+DRUM_NOTES = [35, 36, 38, 40, 42, 46]  # kick, snare, hats
+
 def get_user_inputs():
     print("Available Instruments:", ', '.join(INSTRUMENTS.keys()))
     instrument = input("Choose instrument: ").lower()
@@ -65,6 +85,21 @@ def get_scale(key, scale_type):
 def get_midi_note(note, octave=4):
     return NOTE_TO_MIDI[note] + (octave - 4) * 12
 
+# Every MIDI note of the scale across octaves 3-5
+def get_note_pool(scale):
+    return [get_midi_note(note, octave) for octave in (3, 4, 5) for note in scale]
+
+# Pick a note from the pool and a velocity for every beat
+@njit(cache=True)
+def _gen_notes(total_beats, pool, vel_low, vel_high, seed):
+    np.random.seed(seed)
+    notes = np.empty(total_beats, np.int16)
+    velocities = np.empty(total_beats, np.int16)
+    for i in range(total_beats):
+        notes[i] = pool[np.random.randint(0, pool.size)]
+        velocities[i] = np.random.randint(vel_low, vel_high + 1)
+    return notes, velocities
+
 def generate_melody(instrument, key, scale_type, bpm, duration):
     mid = MidiFile()
     track = MidiTrack()
@@ -80,18 +115,27 @@ def generate_melody(instrument, key, scale_type, bpm, duration):
     beat_time = int(60000 / bpm)
     total_beats = (duration * 1000) // beat_time
 
-    for _ in range(int(total_beats)):
-        if is_drum:
-            drum_note = random.choice([35, 36, 38, 40, 42, 46])  # kick, snare, hats
-            velocity = random.randint(70, 110)
-            track.append(Message('note_on', note=drum_note, velocity=velocity, time=0, channel=channel))
-            track.append(Message('note_off', note=drum_note, velocity=velocity, time=beat_time, channel=channel))
+    pool = DRUM_NOTES if is_drum else get_note_pool(scale)
+    vel_low, vel_high = (70, 110) if is_drum else (60, 100)
+    total_beats = int(total_beats)
+    if NUMPY_AVAILABLE:
+        pool = np.array(pool, dtype=np.int16)
+        seed = random.randrange(2**31)
+        if NUMBA_AVAILABLE:
+            notes, velocities = _gen_notes(total_beats, pool, vel_low, vel_high, seed)
         else:
-            note_name = random.choice(scale)
-            note_midi = get_midi_note(note_name, random.randint(3, 5))
-            velocity = random.randint(60, 100)
-            track.append(Message('note_on', note=note_midi, velocity=velocity, time=0, channel=channel))
-            track.append(Message('note_off', note=note_midi, velocity=velocity, time=beat_time, channel=channel))
+            rng = np.random.default_rng(seed)
+            notes = pool[rng.integers(0, pool.size, size=total_beats)]
+            velocities = rng.integers(vel_low, vel_high + 1, size=total_beats)
+        notes, velocities = notes.tolist(), velocities.tolist()
+    else:
+        # Plain random draws when NumPy is not installed
+        notes = [random.choice(pool) for _ in range(total_beats)]
+        velocities = [random.randint(vel_low, vel_high) for _ in range(total_beats)]
+
+    for note, velocity in zip(notes, velocities):
+        track.append(Message('note_on', note=note, velocity=velocity, time=0, channel=channel))
+        track.append(Message('note_off', note=note, velocity=velocity, time=beat_time, channel=channel))
 
     return mid
 